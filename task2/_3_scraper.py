@@ -12,6 +12,7 @@ import re
 from datetime import datetime
 from urllib.parse import urljoin
 from _2_db import get_session, Phone  # Your separate db file
+from _8_metrics import span, stage_summary
 
 # ============================================================================
 # CONFIGURATION
@@ -218,7 +219,8 @@ def scrape_models(limit=30, delay=1.0):
     # Fetch search results page
     try:
         print(f">> Fetching search results...")
-        resp = requests.get(BASE_SEARCH, headers=HEADERS, proxies=proxies, timeout=15)
+        with span('scrape', 'search_page'):
+            resp = requests.get(BASE_SEARCH, headers=HEADERS, proxies=proxies, timeout=15)
         resp.raise_for_status()
         print(f"✓ Search page loaded successfully\n")
     except Exception as e:
@@ -269,10 +271,12 @@ def scrape_models(limit=30, delay=1.0):
     for idx, (name, link) in enumerate(links, 1):
         try:
             print(f"[{idx}/{len(links)}] >> {name}...", end=" ")
-            r = requests.get(link, headers=HEADERS, proxies=proxies, timeout=15)
+            with span('scrape', 'model_page'):
+                r = requests.get(link, headers=HEADERS, proxies=proxies, timeout=15)
             r.raise_for_status()
 
-            parsed = parse_specs_from_model_page(r.text)
+            with span('parse', 'model_page'):
+                parsed = parse_specs_from_model_page(r.text)
 
             # Create Phone object
             phone = Phone(
@@ -289,7 +293,8 @@ def scrape_models(limit=30, delay=1.0):
             )
 
             session.add(phone)
-            session.commit()
+            with span('db', 'insert'):
+                session.commit()
             saved += 1
 
             # Show extracted info
@@ -310,6 +315,9 @@ def scrape_models(limit=30, delay=1.0):
     print(f"✓ Scraping Complete!")
     print(f"{'=' * 60}")
     print(f"Successfully saved: {saved}/{len(links)} models")
+    print(f"{'=' * 60}")
+    print("Time per stage:")
+    print(stage_summary())
     print(f"{'=' * 60}\n")
 
 
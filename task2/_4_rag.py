@@ -1,41 +1,84 @@
 # _4_rag.py
 from _2_db import get_session
 from _1_models import Phone
+from _8_metrics import span
 from sqlalchemy import select
-from sqlalchemy import func
+from sqlalchemy import func, case, literal, union_all
 
 class RAG:
     def __init__(self):
         pass
 
-    def get_specs(self, model_name):
-        session = get_session()
-        try:
-            stmt = select(Phone).where(
-                func.replace(func.lower(Phone.model_name), ' ', '').like(
-                    f"%{model_name.lower().replace(' ', '').replace('-', '')}%")
+    @staticmethod
+    def _normalize(model_name):
+        return model_name.lower().replace(' ', '').replace('-', '')
+
+    @staticmethod
+    def _normalized_column():
+        return func.replace(func.lower(Phone.model_name), ' ', '')
+
+    @staticmethod
+    def _to_dict(p):
+        return {
+            'model_name': p.model_name,
+            'release_date': p.release_date.isoformat() if p.release_date else None,
+            'display': p.display,
+            'battery': p.battery,
+            'camera': p.camera,
+            'ram': p.ram,
+            'storage': p.storage,
+            'price_usd': float(p.price_usd) if p.price_usd else None,
+            'source_url': p.source_url
+        }
+
+    def get_best_matches(self, model_names):
+        """
+        Resolve several models in one round-trip, best match per name.
+
+        Each distinct normalized name becomes a ranked `LIMIT 1` subquery
+        (exact match, then names ending with it, then the shortest name) and
+        the subqueries are combined with UNION ALL.
+
+        Returns:
+            dict: {model_name: spec dict or None} for every name passed in
+        """
+        keys = {}
+        for name in model_names:
+            keys.setdefault(self._normalize(name), set()).add(name)
+        if not keys:
+            return {}
+
+        norm = self._normalized_column()
+        selects = []
+        for idx, key in enumerate(keys):
+            ranked = (
+                select(*Phone.__table__.c, literal(idx).label('match_idx'))
+                .where(norm.like(f"%{key}%"))
+                .order_by(
+                    case((norm == key, 0), (norm.like(f"%{key}"), 1), else_=2),
+                    func.length(Phone.model_name),
+                    Phone.id,
+                )
+                .limit(1)
+                .subquery()
             )
+            selects.append(select(ranked))
+        stmt = selects[0] if len(selects) == 1 else union_all(*selects)
 
-            # stmt = select(Phone).where(Phone.model_name.ilike(f"%{model_name}%"))
-            result = session.execute(stmt).scalars().all()
-
-            out = []
-            for p in result:
-                out.append({
-                    'model_name': p.model_name,
-                    'release_date': p.release_date.isoformat() if p.release_date else None,
-                    'display': p.display,
-                    'battery': p.battery,
-                    'camera': p.camera,
-                    'ram': p.ram,
-                    'storage': p.storage,
-                    'price_usd': float(p.price_usd) if p.price_usd else None,
-                    'source_url': p.source_url
-                })
-            return out
+        session = get_session()
+        try:
+            with span('db', 'get_best_matches'):
+                rows = session.execute(stmt).all()
         finally:
             session.close()
 
+        out = {name: None for name in model_names}
+        key_list = list(keys)
+        for row in rows:
+            for name in keys[key_list[row.match_idx]]:
+                out[name] = self._to_dict(row)
+        return out
+
     def find_best_battery_under(self, price_limit):
         session = get_session()
         try:
@@ -45,7 +88,8 @@ class RAG:
                 .where(Phone.price_usd <= price_limit)
                 .order_by(Phone.battery.desc().nullslast())
             )
-            phone = session.execute(stmt).scalars().first()
+            with span('db', 'best_battery_under'):
+                phone = session.execute(stmt).scalars().first()
             if not phone:
                 return None
             return {
@@ -1,57 +1,56 @@
 # _5_agents.py
-import os
-import openai
+from collections import namedtuple
 from _4_rag import RAG
-
-openai.api_key = os.getenv('GROQ_API_KEY')
+from _6_llm import AsyncLLMClient
+from _7_prompts import PromptBuilder
 
 rag = RAG()
+llm = AsyncLLMClient()
+
+# text: LLM answer, prompt_tokens: estimated size of the prompt that produced it
+Review = namedtuple('Review', ['text', 'prompt_tokens'])
 
 class DataExtractor:
-    def specs(self, model_name):
-        return rag.get_specs(model_name)
+    def best_matches(self, model_names):
+        return rag.get_best_matches(model_names)
 
     def compare_specs(self, a, b):
-        a_specs = rag.get_specs(a)
-        b_specs = rag.get_specs(b)
-        return a_specs, b_specs
+        # one round-trip, best match each (None if not found)
+        matches = rag.get_best_matches([a, b])
+        return matches[a], matches[b]
 
     def best_battery_under(self, price_limit):
         return rag.find_best_battery_under(price_limit)
 
 
 class ReviewGenerator:
-    def __init__(self, model_name='llama-3.1-8b-instant'):
+    def __init__(self, model_name='llama-3.1-8b-instant', client=None, prompts=None):
         self.model_name = model_name
+        self.client = client or llm
+        self.prompts = prompts or PromptBuilder()
 
-    def generate_comparison(self, a_name, a_specs, b_name, b_specs, focus=None):
-        # Build a structured prompt for the LLM
-        prompt = "You are a helpful tech reviewer. Compare two Samsung phone models."
-        prompt += f"\nModel A: {a_name}\nSpecs: {a_specs}\n\nModel B: {b_name}\nSpecs: {b_specs}\n"
-        if focus:
-            prompt += f"Focus the comparison on {focus}.\n"
-        prompt += "Give a concise conclusion and recommendation. Use plain language."
+    async def generate_comparison(self, a_name, a_specs, b_name, b_specs, focus=None):
+        # Build a compact, focus-aware prompt for the LLM
+        prompt = self.prompts.comparison({**a_specs, 'model_name': a_name}, {**b_specs, 'model_name': b_name}, focus)
 
-        response = openai.ChatCompletion.create(
-            model='llama-3.1-8b-instant',
+        text = await self.client.chat(
+            model=self.model_name,
             messages=[
                         {"role": "system", "content": "You are a phone review assistant."},
-                        {"role": "user", "content": prompt}
+                        {"role": "user", "content": prompt.text}
                     ],
             max_tokens=300,
             temperature=0.2,
         )
-        text = response['choices'][0]['message']['content'].strip()
-        return text
-
-    def generate_recommendation_from_list(self, phones_list, criteria='battery'):
-        prompt = f"You are a helpful tech reviewer. Given this list of phones and their specs, recommend the best one based on {criteria}.\n\n"
-        prompt += str(phones_list)
-        prompt += "\nGive a short recommendation and reason."
-        response = openai.ChatCompletion.create(
-            model='llama-3.1-8b-instant',
-            messages=[{"role":"user","content":prompt}],
+        return Review(text, prompt.tokens)
+
+    async def generate_recommendation_from_list(self, phones_list, criteria='battery'):
+        # ranked + truncated to the token budget, so long lists don't blow up the prompt
+        prompt = self.prompts.recommendation(phones_list, criteria)
+        text = await self.client.chat(
+            model=self.model_name,
+            messages=[{"role":"user","content":prompt.text}],
             max_tokens=200,
             temperature=0.2
         )
-        return response['choices'][0]['message']['content']
\ No newline at end of file
+        return Review(text, prompt.tokens)
\ No newline at end of file
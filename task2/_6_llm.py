@@ -0,0 +1,163 @@
+# _6_llm.py
+# async LLM client (OpenAI-compatible chat completions, e.g. Groq):
+import os
+import json
+import random
+import asyncio
+
+import httpx
+
+from _8_metrics import span, LLM_CALLS_TOTAL, CACHE_TOTAL
+
+LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'https://api.groq.com/openai/v1')
+LLM_API_KEY = os.getenv('GROQ_API_KEY')
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '20'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+
+# status codes worth another attempt (rate limited / upstream hiccups)
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """Raised when the LLM call fails for good (after retries or on a hard error)."""
+
+
+class LLMTimeout(LLMError):
+    """Raised when the per-call deadline runs out."""
+
+
+class _RetryableStatus(Exception):
+    pass
+
+
+class AsyncLLMClient:
+    """
+    Small async client for an OpenAI-compatible /chat/completions endpoint.
+
+    - one shared httpx connection pool for the whole process
+    - a semaphore caps how many calls are in flight at once
+    - every call has a deadline that covers all of its retries
+    - retries back off exponentially with full jitter
+    - identical requests that are already in flight share one upstream call
+
+    Args:
+        base_url: API root, e.g. "https://api.groq.com/openai/v1" or a local stub
+        api_key: bearer token (None for stubs that don't check it)
+        max_concurrency: max simultaneous upstream calls
+        timeout: per-call deadline in seconds
+        max_retries: extra attempts after the first one
+        backoff: base backoff in seconds
+        transport: optional httpx transport (e.g. httpx.MockTransport in tests)
+    """
+
+    def __init__(self, base_url=LLM_BASE_URL, api_key=LLM_API_KEY, max_concurrency=LLM_MAX_CONCURRENCY,
+                 timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES, backoff=0.5, transport=None):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.transport = transport
+
+        self._client = None
+        self._semaphore = None
+        self._inflight = {}
+
+    def _get_client(self):
+        # created lazily so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            headers = {'Content-Type': 'application/json'}
+            if self.api_key:
+                headers['Authorization'] = f"Bearer {self.api_key}"
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+                transport=self.transport,
+            )
+        return self._client
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def chat(self, model, messages, max_tokens=300, temperature=0.2, timeout=None):
+        """
+        Run one chat completion and return the assistant message text.
+
+        Identical payloads that are already in flight are coalesced: later
+        callers await the first caller's result instead of calling again.
+        """
+        payload = {
+            'model': model,
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+        }
+        key = json.dumps(payload, sort_keys=True)
+
+        task = self._inflight.get(key)
+        CACHE_TOTAL.inc(cache='llm_inflight', result='miss' if task is None else 'hit')
+        if task is None:
+            task = asyncio.ensure_future(self._chat_with_retry(payload, timeout or self.timeout))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        # shield: one caller giving up must not cancel the shared call
+        return await asyncio.shield(task)
+
+    async def _chat_with_retry(self, payload, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                LLM_CALLS_TOTAL.inc(outcome='timeout')
+                raise LLMTimeout(f"LLM call exceeded {timeout:.1f}s deadline")
+            try:
+                # the deadline also covers time spent queued on the semaphore
+                text = await asyncio.wait_for(self._guarded_post(payload), remaining)
+                LLM_CALLS_TOTAL.inc(outcome='ok')
+                return text
+            except asyncio.TimeoutError:
+                LLM_CALLS_TOTAL.inc(outcome='timeout')
+                raise LLMTimeout(f"LLM call exceeded {timeout:.1f}s deadline")
+            except (httpx.HTTPError, _RetryableStatus) as e:
+                if attempt >= self.max_retries:
+                    LLM_CALLS_TOTAL.inc(outcome='error')
+                    raise LLMError(f"LLM call failed after {attempt + 1} attempts: {e}") from e
+                LLM_CALLS_TOTAL.inc(outcome='retry')
+            except LLMError:
+                LLM_CALLS_TOTAL.inc(outcome='error')
+                raise
+            # full jitter, never sleeping past the deadline
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+            await asyncio.sleep(min(delay, max(deadline - loop.time(), 0)))
+            attempt += 1
+
+    async def _guarded_post(self, payload):
+        async with self._get_semaphore():
+            with span('llm', 'chat_completions'):
+                return await self._post(payload)
+
+    async def _post(self, payload):
+        resp = await self._get_client().post('/chat/completions', json=payload)
+        if resp.status_code in RETRY_STATUS:
+            raise _RetryableStatus(f"HTTP {resp.status_code}")
+        if resp.status_code >= 400:
+            raise LLMError(f"LLM returned HTTP {resp.status_code}: {resp.text[:200]}")
+        try:
+            data = resp.json()
+            return data['choices'][0]['message']['content'].strip()
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            raise LLMError(f"malformed LLM response: {resp.text[:200]!r}") from e
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,203 @@
+# _7_prompts.py
+# compact, token-budgeted prompts for the review agent:
+import os
+import re
+import math
+from collections import namedtuple
+
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '1200'))
+MAX_CELL_CHARS = 40
+
+# text: final prompt, tokens: estimated prompt tokens,
+# rows: phones included, dropped: phones cut to stay within the budget
+Prompt = namedtuple('Prompt', ['text', 'tokens', 'rows', 'dropped'])
+
+# spec fields in table order (source_url / ids never go to the LLM)
+SPEC_FIELDS = ['model_name', 'price_usd', 'battery', 'display', 'camera', 'ram', 'storage', 'release_date']
+
+# focus / criteria keyword -> fields worth sending
+FOCUS_FIELDS = {
+    'battery': ['battery'],
+    'camera': ['camera'],
+    'photo': ['camera'],
+    'display': ['display'],
+    'screen': ['display'],
+    'storage': ['storage'],
+    'ram': ['ram'],
+    'memory': ['ram', 'storage'],
+    'performance': ['ram', 'release_date'],
+    'price': ['price_usd'],
+    'value': ['price_usd', 'battery', 'ram'],
+    'new': ['release_date'],
+    'newest': ['release_date'],
+    'latest': ['release_date'],
+    'release': ['release_date'],
+}
+
+HEADERS = {
+    'model_name': 'model',
+    'price_usd': 'price_usd',
+    'battery': 'battery_mah',
+    'display': 'display',
+    'camera': 'camera_mp',
+    'ram': 'ram',
+    'storage': 'storage',
+    'release_date': 'released',
+}
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (~4 characters per token for English/spec text).
+
+    Good enough for budgeting; the exact count depends on the model tokenizer.
+    """
+    return max(1, math.ceil(len(text) / 4))
+
+
+def has_keyword(keyword, text):
+    """Whole-word match (plural 's' allowed): 'camera' matches 'cameras', 'ram' does not match 'program'."""
+    return re.search(rf"\b{re.escape(keyword)}s?\b", text) is not None
+
+
+def select_fields(focus=None):
+    """Fields to serialize for a focus/criteria string (all spec fields if nothing matches)."""
+    if not focus:
+        return list(SPEC_FIELDS)
+    focus = focus.lower()
+    wanted = set()
+    for keyword, fields in FOCUS_FIELDS.items():
+        if has_keyword(keyword, focus):
+            wanted.update(fields)
+    if not wanted:
+        return list(SPEC_FIELDS)
+    wanted.update(['model_name', 'price_usd'])
+    return [f for f in SPEC_FIELDS if f in wanted]
+
+
+def compact_value(field, value):
+    """Shorten one spec value, e.g. '6.7 inches, 110.2 cm 2 (...)' -> '6.7 inches'."""
+    if value is None or value == '':
+        return '-'
+    if field == 'price_usd':
+        return f"{float(value):.0f}"
+    if field == 'display':
+        value = str(value).split(',')[0]
+    elif field == 'camera':
+        mps = re.findall(r'(\d+(?:\.\d+)?)\s*MP', str(value))
+        value = '+'.join(mps) if mps else value
+    elif field == 'storage':
+        # "128GB 6GB RAM, 256GB 8GB RAM" -> "128GB/256GB"
+        sizes = []
+        for part in str(value).split(','):
+            m = re.match(r'\s*(\d+\s*[GT]B)', part)
+            if m and m.group(1) not in sizes:
+                sizes.append(m.group(1))
+        value = '/'.join(sizes) if sizes else value
+    value = str(value).replace('|', '/').strip()
+    if len(value) > MAX_CELL_CHARS:
+        value = value[:MAX_CELL_CHARS - 1] + '…'
+    return value
+
+
+def spec_table(phones, fields):
+    """Serialize phones as a pipe-separated table with one header row."""
+    lines = ['|'.join(HEADERS[f] for f in fields)]
+    for p in phones:
+        lines.append('|'.join(compact_value(f, p.get(f)) for f in fields))
+    return '\n'.join(lines)
+
+
+def _number(value):
+    m = re.search(r'\d+(?:\.\d+)?', str(value)) if value is not None else None
+    return float(m.group(0)) if m else None
+
+
+def _camera_mp(value):
+    mps = re.findall(r'(\d+(?:\.\d+)?)\s*MP', str(value or ''))
+    return max(float(x) for x in mps) if mps else None
+
+
+def _battery_per_dollar(p):
+    # "value" = mAh per USD; unknown without both numbers
+    if not p.get('battery') or not p.get('price_usd'):
+        return None
+    return p['battery'] / p['price_usd']
+
+
+# criteria keyword -> (value getter, higher is better)
+RANKERS = {
+    'battery': (lambda p: p.get('battery'), True),
+    'camera': (lambda p: _camera_mp(p.get('camera')), True),
+    'display': (lambda p: _number(p.get('display')), True),
+    'screen': (lambda p: _number(p.get('display')), True),
+    'ram': (lambda p: _number(p.get('ram')), True),
+    'memory': (lambda p: _number(p.get('ram')), True),
+    'storage': (lambda p: _number(p.get('storage')), True),
+    'price': (lambda p: p.get('price_usd'), False),
+    'cheap': (lambda p: p.get('price_usd'), False),
+    'cheapest': (lambda p: p.get('price_usd'), False),
+    'value': (_battery_per_dollar, True),
+    'new': (lambda p: p.get('release_date'), True),
+    'newest': (lambda p: p.get('release_date'), True),
+    'latest': (lambda p: p.get('release_date'), True),
+}
+
+
+def rank_phones(phones, criteria=None):
+    """
+    Pre-rank candidates so the best ones survive truncation.
+
+    Criteria keywords are matched as whole words (see RANKERS; 'value' ranks by
+    mAh per USD). Phones missing the ranked value go last; criteria with no
+    known keyword keep the input order.
+    """
+    criteria = (criteria or '').lower()
+    for keyword, (getter, descending) in RANKERS.items():
+        if has_keyword(keyword, criteria):
+            known = [p for p in phones if getter(p) is not None]
+            unknown = [p for p in phones if getter(p) is None]
+            return sorted(known, key=getter, reverse=descending) + unknown
+    return list(phones)
+
+
+class PromptBuilder:
+    """
+    Builds compact LLM prompts from spec dicts (as returned by RAG.get_best_matches).
+
+    Only the fields relevant to the focus/criteria are sent, as a small table,
+    and the candidate list is ranked and cut so the prompt fits token_budget.
+    """
+
+    def __init__(self, token_budget=PROMPT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+
+    def comparison(self, a_specs, b_specs, focus=None):
+        fields = select_fields(focus)
+        prompt = "You are a helpful tech reviewer. Compare these two Samsung phone models.\n"
+        prompt += spec_table([a_specs, b_specs], fields) + "\n"
+        if focus:
+            prompt += f"Focus the comparison on {focus}.\n"
+        prompt += "Give a concise conclusion and recommendation. Use plain language."
+        return Prompt(prompt, estimate_tokens(prompt), 2, 0)
+
+    def recommendation(self, phones_list, criteria='battery'):
+        fields = select_fields(criteria)
+        ranked = rank_phones(phones_list, criteria)
+
+        head = f"You are a helpful tech reviewer. Given these phones, recommend the best one based on {criteria}.\n"
+        tail = "\nGive a short recommendation and reason."
+        lines = ['|'.join(HEADERS[f] for f in fields)]
+        used = estimate_tokens(head + tail + lines[0])
+        for p in ranked:
+            row = '|'.join(compact_value(f, p.get(f)) for f in fields)
+            cost = estimate_tokens(row + '\n')
+            # always keep at least one candidate
+            if len(lines) > 1 and used + cost > self.token_budget:
+                break
+            lines.append(row)
+            used += cost
+
+        prompt = head + '\n'.join(lines) + tail
+        rows = len(lines) - 1
+        return Prompt(prompt, estimate_tokens(prompt), rows, len(ranked) - rows)
@@ -0,0 +1,257 @@
+# _8_metrics.py
+# lightweight instrumentation: timing spans, counters, histograms,
+# Prometheus text output and an opt-in sampling profiler:
+import os
+import sys
+import time
+import threading
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_str(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for n, v in zip(names, values):
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{n}="{v}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, '') for n in self.labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge read from a callback at render time (e.g. pool size)."""
+
+    def __init__(self, name, help_text, fn):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Histogram:
+    """Cumulative-bucket histogram, Prometheus style."""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        """{label values: (sum, count)} -- handy for quick summaries."""
+        with self._lock:
+            return {key: (s[-2], s[-1]) for key, s in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ('le',)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for i, upper in enumerate(self.buckets):
+                    lines.append(f"{self.name}_bucket{_label_str(names, key + (upper,))} {series[i]}")
+                lines.append(f"{self.name}_bucket{_label_str(names, key + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_str(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'advisor_stage_seconds', 'Time spent per stage (db, llm, parse, scrape).', labels=('stage', 'op')))
+# source="ask" for /ask, "batch" for items (and the whole call, intent="batch") of /ask/batch
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'advisor_request_seconds', 'End-to-end request latency by intent.', labels=('intent', 'source')))
+REQUESTS_TOTAL = REGISTRY.register(Counter(
+    'advisor_requests_total', 'Requests by intent and status code.', labels=('intent', 'source', 'status')))
+LLM_CALLS_TOTAL = REGISTRY.register(Counter(
+    'advisor_llm_calls_total', 'LLM call attempts by outcome.', labels=('outcome',)))
+CACHE_TOTAL = REGISTRY.register(Counter(
+    'advisor_cache_total', 'Cache / dedup lookups by cache and result.', labels=('cache', 'result')))
+DB_POOL_EVENTS = REGISTRY.register(Counter(
+    'advisor_db_pool_events_total', 'DB connection pool events.', labels=('event',)))
+
+
+@contextmanager
+def span(stage, op=''):
+    """Time a block and record it under advisor_stage_seconds{stage, op}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, op=op)
+
+
+def record_request(intent, seconds, status, source='ask'):
+    REQUEST_SECONDS.observe(seconds, intent=intent, source=source)
+    REQUESTS_TOTAL.inc(intent=intent, source=source, status=status)
+
+
+@contextmanager
+def track_request(intent, source='ask'):
+    """Record end-to-end latency and status for one request of the given intent."""
+    start = time.perf_counter()
+    status = 200
+    try:
+        yield
+    except Exception as e:
+        status = getattr(e, 'status_code', 500)
+        raise
+    finally:
+        record_request(intent, time.perf_counter() - start, status, source)
+
+
+def instrument_engine(engine):
+    """Count pool connect/checkout/checkin events and expose checked-out connections."""
+    from sqlalchemy import event
+
+    for name in ('connect', 'checkout', 'checkin'):
+        event.listen(engine, name, lambda *args, _name=name: DB_POOL_EVENTS.inc(event=_name))
+
+    def checked_out():
+        fn = getattr(engine.pool, 'checkedout', None)
+        return fn() if fn else None
+
+    REGISTRY.register(Gauge('advisor_db_pool_checked_out', 'Connections currently checked out.', checked_out))
+
+
+def stage_summary():
+    """Human-readable per-stage totals, e.g. for CLI scripts."""
+    lines = []
+    for (stage, op), (total, count) in sorted(STAGE_SECONDS.snapshot().items()):
+        avg_ms = total / count * 1000 if count else 0.0
+        lines.append(f"{stage:<8} {op:<20} n={count:<5} total={total:.2f}s avg={avg_ms:.1f}ms")
+    return '\n'.join(lines)
+
+
+# ============================================================================
+# SAMPLING PROFILER
+# ============================================================================
+
+class SamplingProfiler:
+    """
+    Tiny wall-clock sampling profiler (no dependencies).
+
+    A background thread grabs every thread's stack each `interval` seconds;
+    results come out in "folded" format (one `frame;frame;frame count` line
+    per stack), which flamegraph.pl / speedscope can read directly.
+
+    Samples are process-wide: every thread is sampled, including the event
+    loop thread (which runs whatever coroutine is scheduled, from any request)
+    and all threadpool workers. Each stack is prefixed with its thread name.
+    Under concurrent traffic a profile therefore mixes in other requests'
+    work; profile with a single request in flight for a clean picture.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.is_set():
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+            self._stop.wait(self.interval)
+
+    def folded(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common()) + '\n'
+
+    def dump(self, directory, label='profile'):
+        """Write the folded stacks to `directory` and return the file path."""
+        os.makedirs(directory, exist_ok=True)
+        safe = ''.join(c if c.isalnum() else '_' for c in label).strip('_') or 'profile'
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{safe}.folded")
+        with open(path, 'w') as f:
+            f.write(self.folded())
+        return path
@@ -0,0 +1,374 @@
+# _9_loadtest.py
+# end-to-end load test for the advisor API with local stand-ins:
+#   - SQLite database seeded from data/gtr_phones2.csv
+#   - stub OpenAI-compatible LLM server with configurable latency
+#   - mixed specs / compare / best-battery traffic at a fixed concurrency
+#
+# Usage:
+#   python _9_loadtest.py --concurrency 16 --duration 30 --llm-latency 0.3
+#   python _9_loadtest.py --out results/run.json --baseline results/prev.json
+import os
+import sys
+import csv
+import json
+import time
+import math
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import datetime
+import tempfile
+import subprocess
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(HERE, 'data', 'gtr_phones2.csv')
+
+DEFAULT_MIX = 'specs=5,compare=3,best_battery=2'
+PRICES = [150, 200, 300, 500, 800, 1000]
+
+
+# ============================================================================
+# STUB LLM SERVER
+# ============================================================================
+
+def _make_stub_app():
+    from fastapi import FastAPI
+
+    latency = float(os.getenv('STUB_LLM_LATENCY', '0.3'))
+    jitter = float(os.getenv('STUB_LLM_JITTER', '0.0'))
+    app = FastAPI(title='Stub LLM')
+
+    @app.get('/health')
+    async def health():
+        return {'ok': True}
+
+    @app.post('/v1/chat/completions')
+    async def chat_completions(body: dict):
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        prompt = body['messages'][-1]['content']
+        return {
+            'id': 'stub',
+            'object': 'chat.completion',
+            'model': body.get('model'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': 'Stub review: both phones are fine, pick by budget.'},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': 12},
+        }
+
+    return app
+
+
+# served with "uvicorn _9_loadtest:stub_app" (latency comes from the env)
+stub_app = _make_stub_app()
+
+
+# ============================================================================
+# SETUP HELPERS
+# ============================================================================
+
+def load_phones(csv_path=CSV_PATH):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def seed_sqlite(db_path, phones):
+    """Create the phones table in a fresh SQLite file and load the CSV rows."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from _1_models import Base, Phone
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        for row in phones:
+            session.add(Phone(
+                model_name=row['model_name'],
+                brand=row['brand'] or 'Samsung',
+                release_date=datetime.date.fromisoformat(row['release_date']) if row['release_date'] else None,
+                display=row['display'] or None,
+                battery=int(row['battery']) if row['battery'] else None,
+                camera=row['camera'] or None,
+                ram=row['ram'] or None,
+                storage=row['storage'] or None,
+                price_usd=float(row['price_usd']) if row['price_usd'] else None,
+                source_url=row['source_url'] or None,
+            ))
+        session.commit()
+    engine.dispose()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(app_path, port, env):
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', app_path, '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=HERE, env=env,
+    )
+
+
+def wait_ready(url, proc, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited early with code {proc.returncode}: {url}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server not ready after {timeout}s: {url}")
+
+
+def stop_server(proc):
+    if proc and proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# ============================================================================
+# TRAFFIC
+# ============================================================================
+
+def parse_mix(mix):
+    """'specs=5,compare=3' -> {'specs': 5.0, 'compare': 3.0}"""
+    weights = {}
+    for part in mix.split(','):
+        intent, _, weight = part.partition('=')
+        weights[intent.strip()] = float(weight or 1)
+    unknown = set(weights) - {'specs', 'compare', 'best_battery'}
+    if unknown:
+        raise ValueError(f"unknown intents in mix: {sorted(unknown)}")
+    return weights
+
+
+def make_question(intent, models, rng):
+    if intent == 'specs':
+        return f"Specs of {rng.choice(models)}"
+    if intent == 'compare':
+        a, b = rng.sample(models, 2)
+        return f"Compare {a} and {b}"
+    return f"Best battery under ${rng.choice(PRICES)}"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def drive(base_url, models, weights, concurrency, duration, warmup, seed):
+    """
+    Run `concurrency` closed-loop workers against /ask for `duration` seconds.
+
+    Requests finishing during the first `warmup` seconds are not recorded.
+
+    Returns:
+        list of (intent, latency_seconds, status_code) and the measured window in seconds
+    """
+    intents = list(weights)
+    intent_weights = list(weights.values())
+    records = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        measure_from = start + warmup
+        stop_at = measure_from + duration
+
+        async def worker(worker_id):
+            rng = random.Random(seed * 1000 + worker_id)
+            while loop.time() < stop_at:
+                intent = rng.choices(intents, intent_weights)[0]
+                question = make_question(intent, models, rng)
+                t0 = loop.time()
+                try:
+                    resp = await client.post('/ask', json={'question': question})
+                    status = resp.status_code
+                except httpx.HTTPError:
+                    status = 0
+                t1 = loop.time()
+                if measure_from <= t1 <= stop_at:
+                    records.append((intent, t1 - t0, status))
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        # measured window actually covered (shorter than `duration` if the run ended early)
+        elapsed = max(0.0, min(loop.time(), stop_at) - measure_from)
+    return records, elapsed
+
+
+def summarize(records, elapsed):
+    """Throughput and latency percentiles, overall and per intent."""
+    def stats(rows):
+        latencies = sorted(r[1] * 1000 for r in rows)
+        # every question uses a seeded model, so a 404 is a lookup regression:
+        # it counts as an error and is also reported on its own
+        errors = sum(1 for r in rows if r[2] == 0 or r[2] >= 400)
+        not_found = sum(1 for r in rows if r[2] == 404)
+        return {
+            'count': len(rows),
+            'errors': errors,
+            'not_found': not_found,
+            'throughput_rps': round(len(rows) / elapsed, 2) if elapsed else None,
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'p50_ms': _round(percentile(latencies, 50)),
+            'p95_ms': _round(percentile(latencies, 95)),
+            'p99_ms': _round(percentile(latencies, 99)),
+            'max_ms': _round(latencies[-1] if latencies else None),
+        }
+
+    by_intent = {}
+    for r in records:
+        by_intent.setdefault(r[0], []).append(r)
+    return {
+        'measured_seconds': round(elapsed, 3),
+        'overall': stats(records),
+        'per_intent': {intent: stats(rows) for intent, rows in sorted(by_intent.items())},
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    print(f"\n{'=' * 72}")
+    cfg = report['config']
+    print(f"Load test: concurrency={cfg['concurrency']} duration={cfg['duration']}s "
+          f"llm_latency={cfg['llm_latency']}s mix={cfg['mix']}")
+    print(f"{'=' * 72}")
+    print(f"{'intent':<14}{'count':>8}{'errors':>8}{'404s':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(report['results']['per_intent'].items()) + [('ALL', report['results']['overall'])]
+    for intent, s in rows:
+        print(f"{intent:<14}{s['count']:>8}{s['errors']:>8}{s['not_found']:>8}{s['throughput_rps'] or 0:>9.1f}"
+              f"{s['p50_ms'] or 0:>10.1f}{s['p95_ms'] or 0:>10.1f}{s['p99_ms'] or 0:>10.1f}")
+        if baseline:
+            base = baseline['results']['overall'] if intent == 'ALL' else baseline['results']['per_intent'].get(intent)
+            if base and base.get('p95_ms') and s['p95_ms']:
+                delta = (s['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100
+                rps_delta = ((s['throughput_rps'] or 0) - (base['throughput_rps'] or 0))
+                err_delta = s['errors'] - base.get('errors', 0)
+                print(f"{'  vs baseline':<14}{'':>8}{err_delta:>+8}{'':>8}{rps_delta:>+9.1f}{'':>10}{delta:>+9.1f}%")
+    print(f"{'=' * 72}\n")
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the Samsung Phone Advisor /ask endpoint.')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent client workers')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of traffic before measuring')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'intent weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='stub LLM response time in seconds')
+    parser.add_argument('--llm-jitter', type=float, default=0.05, help='+/- random stub LLM latency')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--base-url', default=None,
+                        help='test an already running API instead of starting one with the stand-ins')
+    parser.add_argument('--out', default=None, help='write the JSON report here (default: stdout only)')
+    parser.add_argument('--baseline', default=None, help='previous JSON report to compare against')
+    args = parser.parse_args(argv)
+
+    weights = parse_mix(args.mix)
+    phones = load_phones()
+    # "SamsungGalaxy A56" -> "Galaxy A56", the way users type it
+    models = [p['model_name'].replace('Samsung', '', 1).strip() for p in phones]
+
+    stub = api = None
+    tmpdir = tempfile.mkdtemp(prefix='advisor-loadtest-')
+    try:
+        base_url = args.base_url
+        if base_url is None:
+            db_path = os.path.join(tmpdir, 'phones.db')
+            seed_sqlite(db_path, phones)
+
+            stub_port, api_port = free_port(), free_port()
+            env = dict(os.environ)
+            env.update({
+                'STUB_LLM_LATENCY': str(args.llm_latency),
+                'STUB_LLM_JITTER': str(args.llm_jitter),
+            })
+            stub = start_server('_9_loadtest:stub_app', stub_port, env)
+            wait_ready(f"http://127.0.0.1:{stub_port}/health", stub)
+
+            env.update({
+                'DATABASE_URL': f"sqlite:///{db_path}",
+                'LLM_BASE_URL': f"http://127.0.0.1:{stub_port}/v1",
+                'GROQ_API_KEY': 'stub',
+            })
+            api = start_server('main:app', api_port, env)
+            base_url = f"http://127.0.0.1:{api_port}"
+            wait_ready(f"{base_url}/metrics", api)
+
+        records, elapsed = asyncio.run(drive(base_url, models, weights, args.concurrency,
+                                             args.duration, args.warmup, args.seed))
+    finally:
+        stop_server(api)
+        stop_server(stub)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'config': {
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'mix': weights,
+            'llm_latency': args.llm_latency if args.base_url is None else None,
+            'llm_jitter': args.llm_jitter if args.base_url is None else None,
+            'seed': args.seed,
+            'target': args.base_url or 'local stand-ins (sqlite + stub llm)',
+        },
+        'results': summarize(records, elapsed),
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
+    else:
+        print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+# conftest.py
+# tests run against a temporary SQLite database seeded from data/gtr_phones2.csv
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# must be set before _2_db is imported (the engine is built at import time)
+_DB_DIR = tempfile.mkdtemp(prefix='advisor-tests-')
+DB_PATH = os.path.join(_DB_DIR, 'phones.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault('LLM_BASE_URL', 'http://llm.invalid/v1')
+
+
+@pytest.fixture(scope='session')
+def seeded_db():
+    from _9_loadtest import load_phones, seed_sqlite
+
+    seed_sqlite(DB_PATH, load_phones())
+    yield DB_PATH
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def sql_log():
+    """SQL statements sent to the test database while the test runs."""
+    from sqlalchemy import event
+    from _2_db import engine
+
+    statements = []
+
+    def log(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', log)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', log)
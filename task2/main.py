@@ -1,28 +1,89 @@
 # main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from _5_agents import DataExtractor, ReviewGenerator
+from _5_agents import DataExtractor, ReviewGenerator, llm
+from _6_llm import LLMError, LLMTimeout
+from _8_metrics import CACHE_TOTAL, REGISTRY, SamplingProfiler, record_request, span, track_request
+import os
 import re
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 
-app = FastAPI(title='Samsung Phone Advisor')
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '64'))
+BATCH_LLM_CONCURRENCY = int(os.getenv('BATCH_LLM_CONCURRENCY', '4'))
+# sampling profiler, switched on per request with an "X-Profile: 1" header;
+# it samples the whole process while that request runs (see SamplingProfiler)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # close the shared LLM connection pool on shutdown
+    await llm.aclose()
+
+
+app = FastAPI(title='Samsung Phone Advisor', lifespan=lifespan)
 
 data_agent = DataExtractor()
 review_agent = ReviewGenerator()
 
+
+async def profile_request(request: Request, call_next):
+    if request.headers.get('x-profile') != '1':
+        return await call_next(request)
+    profiler = SamplingProfiler(interval=PROFILE_INTERVAL).start()
+    try:
+        response = await call_next(request)
+    finally:
+        # thread join + file write: keep them off the event loop
+        await run_in_threadpool(profiler.stop)
+    response.headers['X-Profile-File'] = await run_in_threadpool(profiler.dump, PROFILE_DIR, request.url.path)
+    return response
+
+
+# only installed when enabled: the middleware wrapper costs every request
+if PROFILING_ENABLED:
+    app.middleware('http')(profile_request)
+
+
 class AskRequest(BaseModel):
     question: str
 
 class AskResponse(BaseModel):
     answer: str
     sources: list | None = None
+    prompt_tokens: int | None = None
+
+class AskBatchRequest(BaseModel):
+    questions: list[str]
+
+class AskBatchItem(BaseModel):
+    answer: str | None = None
+    sources: list | None = None
+    prompt_tokens: int | None = None
+    error: str | None = None
+    status_code: int | None = None
+
+class AskBatchResponse(BaseModel):
+    results: list[AskBatchItem]
 
 
 def parse_question(q: str):
     q_low = q.lower()
     # 1) Compare X and Y
-    m = re.search(r'compare\s+(.*?)\s+and\s+(.*)', q_low)
+    #    optional focus: "Compare X and Y on camera" / "... for battery life"
+    m = re.search(r'compare\s+(.*?)\s+and\s+(.*?)(?:\s+(?:on|for|by)\s+(.*?))?[\s?.!]*$', q_low)
     if m:
-        return {'intent': 'compare', 'a': m.group(1).strip(), 'b': m.group(2).strip()}
+        return {'intent': 'compare', 'a': m.group(1).strip(), 'b': m.group(2).strip(), 'focus': m.group(3)}
     # 2) Specs of Model
     m2 = re.search(r'specs\s+of\s+(.*)', q_low)
     if m2:
@@ -35,40 +96,140 @@ def parse_question(q: str):
     return {'intent': 'general', 'q': q}
 
 
+def specs_answer(p):
+    if not p:
+        raise HTTPException(status_code=404, detail='Model not found')
+    # build answer text
+    answer = f"{p['model_name']} has {p['display']}, {p['battery']}mAh battery, camera: {p['camera']}, RAM: {p['ram']}, storage: {p['storage']}."
+    return {'answer': answer, 'sources': [p['source_url']]}
+
+
+async def compare_answer(a, b, focus=None):
+    if not a or not b:
+        raise HTTPException(status_code=404, detail='One or both models not found')
+    # use review agent
+    try:
+        review = await review_agent.generate_comparison(a['model_name'], a, b['model_name'], b, focus)
+    except LLMTimeout:
+        raise HTTPException(status_code=504, detail='Review generation timed out')
+    except LLMError:
+        raise HTTPException(status_code=502, detail='Review generation failed')
+    # compose a short facts section
+    facts = f"Facts:\n{a['model_name']}: {a['display']}, {a['battery']}mAh.\n{b['model_name']}: {b['display']}, {b['battery']}mAh."
+    answer = facts + "\n\nReview:\n" + review.text
+    sources = [a['source_url'], b['source_url']]
+    return {'answer': answer, 'sources': sources, 'prompt_tokens': review.prompt_tokens}
+
+
+def best_battery_answer(found, price):
+    if not found:
+        raise HTTPException(status_code=404, detail='No phone found under that price with battery info')
+    ans = f"{found['model_name']} has the largest battery under ${price}: {found['battery']} mAh (price: ${found['price_usd']})."
+    return {'answer': ans, 'sources': [found['source_url']]}
+
+
+# fallback: try to answer general queries by searching models for names
+FALLBACK_ANSWER = {'answer': "Sorry — I couldn't interpret that question. Try: 'Specs of <model>', 'Compare <A> and <B>', or 'Best battery under $X'.", 'sources': None}
+
+
 @app.post('/ask', response_model=AskResponse)
 async def ask(req: AskRequest):
-    parsed = parse_question(req.question)
+    with span('parse', 'parse_question'):
+        parsed = parse_question(req.question)
+    with track_request(parsed['intent']):
+        return await answer_question(parsed)
 
+
+async def answer_question(parsed):
+    # DB work is blocking: keep it off the event loop
     if parsed['intent'] == 'specs':
-        specs = data_agent.specs(parsed['model'])
-        if not specs:
-            raise HTTPException(status_code=404, detail='Model not found')
-        # build answer text
-        p = specs[0]
-        answer = f"{p['model_name']} has {p['display']}, {p['battery']}mAh battery, camera: {p['camera']}, RAM: {p['ram']}, storage: {p['storage']}."
-        return {'answer': answer, 'sources': [p['source_url']]}
+        matches = await run_in_threadpool(data_agent.best_matches, [parsed['model']])
+        return specs_answer(matches[parsed['model']])
 
     if parsed['intent'] == 'compare':
-        a_raw = parsed['a']
-        b_raw = parsed['b']
-        a_specs = data_agent.specs(a_raw)
-        b_specs = data_agent.specs(b_raw)
-        if not a_specs or not b_specs:
-            raise HTTPException(status_code=404, detail='One or both models not found')
-        # use review agent
-        text = review_agent.generate_comparison(a_specs[0]['model_name'], a_specs[0], b_specs[0]['model_name'], b_specs[0])
-        # compose a short facts section
-        facts = f"Facts:\n{a_specs[0]['model_name']}: {a_specs[0]['display']}, {a_specs[0]['battery']}mAh.\n{b_specs[0]['model_name']}: {b_specs[0]['display']}, {b_specs[0]['battery']}mAh."
-        answer = facts + "\n\nReview:\n" + text
-        sources = [a_specs[0]['source_url'], b_specs[0]['source_url']]
-        return {'answer': answer, 'sources': sources}
+        # both models resolved in one round-trip, best match each
+        matches = await run_in_threadpool(data_agent.best_matches, [parsed['a'], parsed['b']])
+        return await compare_answer(matches[parsed['a']], matches[parsed['b']], parsed['focus'])
 
     if parsed['intent'] == 'best_battery':
-        found = data_agent.best_battery_under(parsed['price'])
-        if not found:
-            raise HTTPException(status_code=404, detail='No phone found under that price with battery info')
-        ans = f"{found['model_name']} has the largest battery under ${parsed['price']}: {found['battery']} mAh (price: ${found['price_usd']})."
-        return {'answer': ans, 'sources': [found['source_url']]}
-
-    # fallback: try to answer general queries by searching models for names
-    return {'answer': "Sorry — I couldn't interpret that question. Try: 'Specs of <model>', 'Compare <A> and <B>', or 'Best battery under $X'.", 'sources': None}
\ No newline at end of file
+        found = await run_in_threadpool(data_agent.best_battery_under, parsed['price'])
+        return best_battery_answer(found, parsed['price'])
+
+    return FALLBACK_ANSWER
+
+
+@app.post('/ask/batch', response_model=AskBatchResponse)
+async def ask_batch(req: AskBatchRequest):
+    """
+    Answer many questions at once.
+
+    Model lookups across all questions are deduplicated into one query, LLM
+    calls run concurrently (at most BATCH_LLM_CONCURRENCY per batch) and
+    results come back in request order; a failing question gets an
+    `error` entry instead of failing the whole batch.
+    """
+    if len(req.questions) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f'At most {MAX_BATCH_SIZE} questions per batch')
+
+    with span('parse', 'parse_question'):
+        parsed_list = [parse_question(q) for q in req.questions]
+    with track_request('batch', source='batch'):
+        return {'results': await answer_batch(parsed_list)}
+
+
+async def answer_batch(parsed_list):
+    started = time.perf_counter()
+    names = []
+    prices = []
+    for parsed in parsed_list:
+        if parsed['intent'] == 'specs':
+            names.append(parsed['model'])
+        elif parsed['intent'] == 'compare':
+            names.extend([parsed['a'], parsed['b']])
+        elif parsed['intent'] == 'best_battery' and parsed['price'] not in prices:
+            prices.append(parsed['price'])
+
+    CACHE_TOTAL.inc(len(names) - len(set(names)), cache='batch_lookup', result='hit')
+    CACHE_TOTAL.inc(len(set(names)), cache='batch_lookup', result='miss')
+
+    # DB work is blocking: keep it off the event loop; distinct prices run
+    # in parallel with the single model lookup
+    specs_task = run_in_threadpool(data_agent.best_matches, names)
+    price_tasks = [run_in_threadpool(data_agent.best_battery_under, price) for price in prices]
+    match_by_name, *found = await asyncio.gather(specs_task, *price_tasks)
+    best_by_price = dict(zip(prices, found))
+
+    llm_slots = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+    async def answer_item(parsed):
+        try:
+            if parsed['intent'] == 'specs':
+                return specs_answer(match_by_name[parsed['model']])
+            if parsed['intent'] == 'compare':
+                async with llm_slots:
+                    return await compare_answer(match_by_name[parsed['a']], match_by_name[parsed['b']],
+                                                parsed['focus'])
+            if parsed['intent'] == 'best_battery':
+                return best_battery_answer(best_by_price[parsed['price']], parsed['price'])
+            return FALLBACK_ANSWER
+        except HTTPException as e:
+            return {'error': e.detail, 'status_code': e.status_code}
+        except Exception:
+            # one broken item must not fail the rest of the batch
+            logger.exception('Batch item failed: %r', parsed)
+            return {'error': 'Internal error', 'status_code': 500}
+
+    async def answer(parsed):
+        result = await answer_item(parsed)
+        # per-item latency (from the start of the batch) and status, by intent
+        record_request(parsed['intent'], time.perf_counter() - started,
+                       result.get('status_code') or 200, source='batch')
+        return result
+
+    return await asyncio.gather(*(answer(parsed) for parsed in parsed_list))
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the counters and histograms in _8_metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4')
@@ -0,0 +1,118 @@
+# test_llm.py
+# AsyncLLMClient against an in-process httpx.MockTransport (run: pytest -q)
+import asyncio
+
+import httpx
+import pytest
+
+from _6_llm import AsyncLLMClient, LLMError, LLMTimeout
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def ok(text='fine'):
+    return httpx.Response(200, json={'choices': [{'message': {'content': text}}]})
+
+
+def make_client(handler, **kwargs):
+    kwargs.setdefault('backoff', 0)
+    return AsyncLLMClient(base_url='http://llm.test/v1', api_key=None,
+                          transport=httpx.MockTransport(handler), **kwargs)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_retries_then_succeeds():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503) if len(calls) == 1 else ok('second try')
+
+    async def go():
+        client = make_client(handler, max_retries=2)
+        try:
+            return await client.chat('m', MESSAGES)
+        finally:
+            await client.aclose()
+
+    assert run(go()) == 'second try'
+    assert len(calls) == 2
+
+
+def test_gives_up_after_max_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429)
+
+    async def go():
+        client = make_client(handler, max_retries=1)
+        try:
+            await client.chat('m', MESSAGES)
+        finally:
+            await client.aclose()
+
+    with pytest.raises(LLMError):
+        run(go())
+    assert len(calls) == 2
+
+
+def test_identical_inflight_requests_are_coalesced():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return ok('shared')
+
+    async def go():
+        client = make_client(handler)
+        try:
+            return await asyncio.gather(
+                client.chat('m', MESSAGES),
+                client.chat('m', MESSAGES),
+                client.chat('other-model', MESSAGES),
+            )
+        finally:
+            await client.aclose()
+
+    assert run(go()) == ['shared', 'shared', 'shared']
+    # two identical payloads share one call, the different model gets its own
+    assert len(calls) == 2
+
+
+def test_deadline_covers_slow_upstream():
+    async def handler(request):
+        await asyncio.sleep(1)
+        return ok()
+
+    async def go():
+        client = make_client(handler, timeout=0.1)
+        try:
+            await client.chat('m', MESSAGES)
+        finally:
+            await client.aclose()
+
+    with pytest.raises(LLMTimeout):
+        run(go())
+
+
+@pytest.mark.parametrize('response', [
+    httpx.Response(200, text='<html>proxy error</html>'),
+    httpx.Response(200, json={'choices': []}),
+    httpx.Response(200, json={'choices': [{'message': {'content': None}}]}),
+])
+def test_malformed_reply_raises_llm_error(response):
+    async def go():
+        client = make_client(lambda request: response)
+        try:
+            await client.chat('m', MESSAGES)
+        finally:
+            await client.aclose()
+
+    with pytest.raises(LLMError, match='malformed'):
+        run(go())
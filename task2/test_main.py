@@ -0,0 +1,100 @@
+# test_main.py
+# /ask and /ask/batch against the seeded SQLite db with a stubbed review agent (run: pytest -q)
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from main import parse_question
+from _5_agents import Review
+from _6_llm import LLMError
+
+
+@pytest.mark.parametrize('question, expected', [
+    ('Compare Galaxy A56 and Galaxy A36', {'intent': 'compare', 'a': 'galaxy a56', 'b': 'galaxy a36', 'focus': None}),
+    ('Compare Galaxy A56 and Galaxy A36 on camera?', {'intent': 'compare', 'a': 'galaxy a56', 'b': 'galaxy a36', 'focus': 'camera'}),
+    ('compare a16 and a56 for battery life', {'intent': 'compare', 'a': 'a16', 'b': 'a56', 'focus': 'battery life'}),
+    ('Specs of Galaxy S24', {'intent': 'specs', 'model': 'galaxy s24'}),
+    ('Best battery under $300', {'intent': 'best_battery', 'price': 300.0}),
+])
+def test_parse_question(question, expected):
+    assert parse_question(question) == expected
+
+
+@pytest.fixture
+def client(seeded_db, monkeypatch):
+    async def fake_comparison(a_name, a_specs, b_name, b_specs, focus=None):
+        if b_name.endswith('S25 Ultra'):
+            raise LLMError('upstream broke')
+        return Review(f"{a_name} vs {b_name}", 42)
+
+    monkeypatch.setattr(main.review_agent, 'generate_comparison', fake_comparison)
+    with TestClient(main.app) as c:
+        yield c
+
+
+def test_ask_specs(client):
+    r = client.post('/ask', json={'question': 'Specs of Galaxy S24'})
+    assert r.status_code == 200
+    assert r.json()['answer'].startswith('SamsungGalaxy S24 has')
+
+
+def test_batch_results_in_request_order_with_per_item_errors(client):
+    questions = [
+        'Compare Galaxy A56 and Galaxy A36',
+        'Specs of Galaxy A16',
+        'Specs of Galaxy Nope 3000',
+        'Compare Galaxy A56 and Galaxy S25 Ultra',
+        'Best battery under $300',
+        'hello there',
+    ]
+    r = client.post('/ask/batch', json={'questions': questions})
+    assert r.status_code == 200
+    results = r.json()['results']
+    assert len(results) == len(questions)
+
+    assert 'SamsungGalaxy A56 vs SamsungGalaxy A36' in results[0]['answer']
+    assert results[0]['prompt_tokens'] == 42
+    assert results[1]['answer'].startswith('SamsungGalaxy A16 has')
+    assert (results[2]['status_code'], results[2]['answer']) == (404, None)
+    assert (results[3]['status_code'], results[3]['error']) == (502, 'Review generation failed')
+    assert 'largest battery under $300' in results[4]['answer']
+    assert results[5]['answer'].startswith('Sorry')
+    assert all(results[i]['error'] is None for i in (0, 1, 4, 5))
+
+
+def test_batch_unexpected_item_error_does_not_fail_batch(client, monkeypatch):
+    async def boom(*args, **kwargs):
+        raise RuntimeError('bug')
+
+    monkeypatch.setattr(main.review_agent, 'generate_comparison', boom)
+    r = client.post('/ask/batch', json={'questions': ['Specs of Galaxy A56', 'Compare Galaxy A56 and Galaxy A36']})
+    assert r.status_code == 200
+    first, second = r.json()['results']
+    assert first['answer'].startswith('SamsungGalaxy A56 has')
+    assert (second['status_code'], second['error']) == (500, 'Internal error')
+
+
+def test_batch_too_large(client, monkeypatch):
+    monkeypatch.setattr(main, 'MAX_BATCH_SIZE', 2)
+    r = client.post('/ask/batch', json={'questions': ['Specs of Galaxy A56'] * 3})
+    assert r.status_code == 413
+
+
+def test_batch_resolves_models_in_one_query(client, sql_log):
+    questions = [
+        'Specs of Galaxy A56',
+        'Specs of galaxy a56',
+        'Compare Galaxy A56 and Galaxy A36',
+        'Compare Galaxy A36 and Galaxy A16',
+    ]
+    r = client.post('/ask/batch', json={'questions': questions})
+    assert r.status_code == 200
+    assert all(item['error'] is None for item in r.json()['results'])
+    # three distinct models, one round-trip
+    assert len(sql_log) == 1
+    assert sql_log[0].count('LIMIT') == 3
+
+
+def test_profiler_middleware_not_installed_by_default():
+    assert not main.PROFILING_ENABLED
+    assert main.app.user_middleware == []
@@ -0,0 +1,75 @@
+# test_prompts.py
+# PromptBuilder field selection, ranking and token budget (run: pytest -q)
+from _7_prompts import (PromptBuilder, SPEC_FIELDS, estimate_tokens, has_keyword,
+                        rank_phones, select_fields)
+
+
+def phone(name, battery=None, price=None, released=None):
+    return {'model_name': name, 'battery': battery, 'price_usd': price, 'release_date': released,
+            'display': '6.5 inches, 102.0 cm 2', 'camera': '50 MP, f/1.8', 'ram': '8GB',
+            'storage': '128GB 8GB RAM, 256GB 8GB RAM'}
+
+
+def many_phones(n):
+    return [phone(f"Galaxy Test {i}", battery=4000 + i * 10, price=100 + i) for i in range(n)]
+
+
+def names(phones):
+    return [p['model_name'] for p in phones]
+
+
+def test_keywords_match_whole_words_only():
+    assert has_keyword('camera', 'cameras')
+    assert has_keyword('battery', 'battery life')
+    assert not has_keyword('ram', 'program')
+    assert not has_keyword('new', 'renewed')
+
+
+def test_select_fields():
+    assert select_fields('camera quality') == ['model_name', 'price_usd', 'camera']
+    # no known keyword -> everything
+    assert select_fields('program') == SPEC_FIELDS
+    assert select_fields(None) == SPEC_FIELDS
+
+
+def test_unknown_criteria_keeps_input_order():
+    phones = [phone('a', released='2023-01-01'), phone('b', released='2025-01-01')]
+    assert names(rank_phones(phones, 'renewed')) == ['a', 'b']
+    assert names(rank_phones(phones, 'latest')) == ['b', 'a']
+
+
+def test_value_ranks_by_mah_per_usd_with_unknowns_last():
+    phones = [
+        phone('pricey', battery=5000, price=1000),   # 5 mAh/$
+        phone('no price', battery=6000),
+        phone('bargain', battery=5000, price=100),   # 50 mAh/$
+        phone('middle', battery=4000, price=200),    # 20 mAh/$
+    ]
+    assert names(rank_phones(phones, 'value')) == ['bargain', 'middle', 'pricey', 'no price']
+
+
+def test_recommendation_fits_budget_and_keeps_best():
+    phones = many_phones(50)
+    budget = 150
+    prompt = PromptBuilder(token_budget=budget).recommendation(phones, 'battery')
+
+    assert prompt.tokens <= budget
+    assert prompt.tokens == estimate_tokens(prompt.text)
+    assert 1 < prompt.rows < 50
+    assert prompt.rows + prompt.dropped == 50
+    # header + one line per kept phone between the head and tail lines
+    table = prompt.text.splitlines()[2:-1]
+    assert len(table) == prompt.rows
+    # highest battery survives the cut
+    assert table[0].startswith('Galaxy Test 49|')
+
+
+def test_recommendation_always_keeps_one_row():
+    prompt = PromptBuilder(token_budget=1).recommendation(many_phones(5), 'battery')
+    assert prompt.rows == 1
+    assert prompt.dropped == 4
+
+
+def test_recommendation_without_truncation():
+    prompt = PromptBuilder(token_budget=10_000).recommendation(many_phones(5), 'battery')
+    assert (prompt.rows, prompt.dropped) == (5, 0)
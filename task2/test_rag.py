@@ -0,0 +1,57 @@
+# test_rag.py
+# RAG.get_best_matches against the seeded SQLite db (run: pytest -q)
+import pytest
+
+from _4_rag import RAG
+
+
+@pytest.fixture
+def rag(seeded_db):
+    return RAG()
+
+
+def model(match):
+    return match['model_name'] if match else None
+
+
+def test_prefers_exact_model_over_longer_variants(rag):
+    # S24 Ultra and S24 FE also contain "galaxys24"
+    matches = rag.get_best_matches(['galaxy s24', 'Galaxy S24 Ultra', 'galaxy s24 fe'])
+    assert model(matches['galaxy s24']) == 'SamsungGalaxy S24'
+    assert model(matches['Galaxy S24 Ultra']) == 'SamsungGalaxy S24 Ultra'
+    assert model(matches['galaxy s24 fe']) == 'SamsungGalaxy S24 FE'
+
+
+def test_names_with_same_key_are_all_filled(rag, sql_log):
+    matches = rag.get_best_matches(['Galaxy A56', 'galaxy-a56', 'GALAXY A56'])
+    assert set(matches) == {'Galaxy A56', 'galaxy-a56', 'GALAXY A56'}
+    assert {model(m) for m in matches.values()} == {'SamsungGalaxy A56'}
+    # one distinct key -> one ranked subquery
+    assert len(sql_log) == 1
+    assert sql_log[0].count('LIMIT') == 1
+
+
+def test_unknown_name_maps_to_none(rag):
+    matches = rag.get_best_matches(['galaxy a56', 'galaxy nope 3000'])
+    assert model(matches['galaxy a56']) == 'SamsungGalaxy A56'
+    assert matches['galaxy nope 3000'] is None
+
+
+def test_empty_list_skips_the_db(rag, sql_log):
+    assert rag.get_best_matches([]) == {}
+    assert sql_log == []
+
+
+def test_single_name_has_no_union(rag, sql_log):
+    matches = rag.get_best_matches(['galaxy a16'])
+    # "SamsungGalaxy A16 5G" also matches; the suffix match wins
+    assert model(matches['galaxy a16']) == 'SamsungGalaxy A16'
+    assert len(sql_log) == 1
+    assert 'UNION' not in sql_log[0]
+
+
+def test_several_names_use_one_union_query(rag, sql_log):
+    matches = rag.get_best_matches(['galaxy a16', 'galaxy a36', 'galaxy s24'])
+    assert [model(m) for m in matches.values()] == ['SamsungGalaxy A16', 'SamsungGalaxy A36', 'SamsungGalaxy S24']
+    assert len(sql_log) == 1
+    assert sql_log[0].count('UNION ALL') == 2